@@ -5,7 +5,9 @@ This simulates the complete workflow including LLM code generation.
 """
 
 import os
+import re
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -21,13 +23,7 @@ DEFAULT_PLOT_DIR = Path(
 ).resolve()  # assumes this script is run from repo root
 
 
-def simulate_llm_response(request: str, context: str) -> str:
-    """Simulate LLM response for different visualization requests."""
-
-    request_lower = request.lower()
-
-    if "bar chart" in request_lower and "product" in request_lower:
-        return """
+_BAR_CHART_RESPONSE = """
 import matplotlib.pyplot as plt
 df_grouped = df.groupby('product')['sales'].sum()
 plt.figure(figsize=(10, 6))
@@ -40,8 +36,7 @@ plt.tight_layout()
 plt.show()
 """
 
-    elif "line chart" in request_lower and "time" in request_lower:
-        return """
+_LINE_CHART_RESPONSE = """
 import matplotlib.pyplot as plt
 import pandas as pd
 df['date'] = pd.to_datetime(df['date'])
@@ -56,8 +51,7 @@ plt.tight_layout()
 plt.show()
 """
 
-    elif "pie chart" in request_lower and "region" in request_lower:
-        return """
+_PIE_CHART_RESPONSE = """
 import matplotlib.pyplot as plt
 region_sales = df.groupby('region')['sales'].sum()
 plt.figure(figsize=(8, 8))
@@ -66,8 +60,7 @@ plt.title('Sales Distribution by Region')
 plt.show()
 """
 
-    elif "scatter" in request_lower:
-        return """
+_SCATTER_RESPONSE = """
 import matplotlib.pyplot as plt
 plt.figure(figsize=(10, 6))
 plt.scatter(df['sales'], df['revenue'], alpha=0.7)
@@ -78,8 +71,7 @@ plt.tight_layout()
 plt.show()
 """
 
-    else:
-        return """
+_HISTOGRAM_RESPONSE = """
 import matplotlib.pyplot as plt
 plt.figure(figsize=(10, 6))
 plt.hist(df['sales'], bins=10, edgecolor='black', alpha=0.7)
@@ -90,6 +82,36 @@ plt.tight_layout()
 plt.show()
 """
 
+# Single compiled alternation replaces the if/elif substring cascade; the
+# matched group name indexes the response table in one pass over the request
+_DISPATCH_RE = re.compile(
+    r"(?P<bar>bar chart.*product)"
+    r"|(?P<line>line chart.*time)"
+    r"|(?P<pie>pie chart.*region)"
+    r"|(?P<scatter>scatter)",
+    re.IGNORECASE,
+)
+
+_RESPONSES = {
+    "bar": _BAR_CHART_RESPONSE,
+    "line": _LINE_CHART_RESPONSE,
+    "pie": _PIE_CHART_RESPONSE,
+    "scatter": _SCATTER_RESPONSE,
+    None: _HISTOGRAM_RESPONSE,
+}
+
+
+def simulate_llm_response(request: str, context: str) -> str:
+    """Simulate LLM response for different visualization requests."""
+    match = _DISPATCH_RE.search(request)
+    return _RESPONSES[match.lastgroup if match else None]
+
+
+@lru_cache(maxsize=128)
+def _compile_viz_code(code: str):
+    """Compile a visualization snippet once and reuse the code object."""
+    return compile(code, "<viz>", "exec")
+
 
 def execute_visualization_code(
     code: str, df: pd.DataFrame, save_plot: bool = False
@@ -107,7 +129,7 @@ def execute_visualization_code(
         )
 
     try:
-        exec(code.strip(), exec_globals)
+        exec(_compile_viz_code(code.strip()), exec_globals)
         if save_plot:
             print(f"   ✓ Visualization saved to {DEFAULT_PLOT_DIR}/demo_plot.png")
         else:
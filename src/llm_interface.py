@@ -2,33 +2,54 @@
 Module for interfacing with OpenAI LLMs to generate data visualization code.
 """
 
+import ast
+import asyncio
+import hashlib
+import io
+import json
 import os
+import re
+import sqlite3
+import sys
+import threading
+import wave
 from typing import Optional
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from openai import OpenAI
 
+try:
+    from . import _audio
+except ImportError:
+    import _audio
 
-class LLMInterface:
-    """Interface for generating visualization code using OpenAI LLMs."""
+# Default location for the persistent response cache
+_DEFAULT_CACHE_DB = os.path.expanduser("~/.cache/explore-data-assist/llm_cache.db")
 
-    def __init__(self, api_key: Optional[str] = None):
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+# Sampling temperature for code generation. Responses are only cached at
+# low temperature — caching stochastic output would replay one arbitrary
+# sample forever.
+_CHAT_TEMPERATURE = 0.1
+_CACHE_MAX_TEMPERATURE = 0.3
 
-    def generate_visualization_code(
-        self, dataset_context: str, user_request: str
-    ) -> str:
-        """Generate matplotlib code for the requested visualization."""
+# gpt-4o-mini is faster and cheaper than gpt-3.5-turbo for short code
+# generation, and viz snippets never need anywhere near 1000 completion
+# tokens — latency scales with the tokens streamed
+_CHAT_MODEL = "gpt-4o-mini"
+_CHAT_MAX_TOKENS = 400
 
-        system_prompt = """You are a data visualization expert. Your task is to generate Python code using matplotlib to create visualizations based on user requests and dataset information.
+# Static system prompt hoisted to module scope: a byte-identical prefix on
+# every request lets the provider's prompt-prefix (KV) cache amortize these
+# tokens across calls. Per-dataset context and the user request follow as
+# separate messages, most-variable content last.
+SYSTEM_PROMPT = """You are a data visualization expert. Your task is to generate Python code using matplotlib to create visualizations based on user requests and dataset information.
 
 Guidelines:
 1. Always use the variable 'df' to refer to the pandas DataFrame
 2. Always use matplotlib.pyplot (imported as plt) for visualizations
 3. Include proper labels, titles, and formatting
 4. Make the visualization clear and informative
-5. Only return the Python code, no explanations
+5. Return a JSON object of the form {"code": "<python code>"} with no other keys and no explanations
 6. Always call plt.show() at the end to display the plot
 7. Handle potential data type conversions if needed
 8. Use appropriate plot types based on data types (categorical vs numerical)
@@ -36,65 +57,826 @@ Guidelines:
 
 The code should be ready to execute directly."""
 
-        user_prompt = f"""Dataset Context:
-{dataset_context}
+# Process-wide httpx client shared by all LLMInterface instances
+_HTTP_CLIENT = None
+
+
+def _shared_http_client():
+    """Return the shared httpx client, creating it on first use.
+
+    Reusing one connection pool avoids a fresh TLS handshake for every
+    interface instance, and HTTP/2 (available when the httpx[http2] extra
+    is installed) lets chat, embedding, and transcription requests
+    multiplex over a single connection.
+    """
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        import httpx
+        limits = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+        try:
+            _HTTP_CLIENT = httpx.Client(http2=True, timeout=30.0, limits=limits)
+        except ImportError:
+            # The h2 package is not installed; HTTP/1.1 still shares the pool
+            _HTTP_CLIENT = httpx.Client(timeout=30.0, limits=limits)
+    return _HTTP_CLIENT
+
+
+# Process-wide async httpx client; httpx pools are not shared between sync
+# and async clients, so the async side keeps its own
+_ASYNC_HTTP_CLIENT = None
 
-User Request: {user_request}
 
-Please generate matplotlib code to create this visualization."""
+def _shared_async_http_client():
+    """Return the shared async httpx client, creating it on first use.
+
+    The async counterpart of _shared_http_client with the same limits:
+    concurrent codegen requests issued via asyncio.gather multiplex over
+    one pooled connection instead of each opening their own.
+    """
+    global _ASYNC_HTTP_CLIENT
+    if _ASYNC_HTTP_CLIENT is None:
+        import httpx
+        limits = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+        try:
+            _ASYNC_HTTP_CLIENT = httpx.AsyncClient(http2=True, timeout=30.0, limits=limits)
+        except ImportError:
+            _ASYNC_HTTP_CLIENT = httpx.AsyncClient(timeout=30.0, limits=limits)
+    return _ASYNC_HTTP_CLIENT
+
+
+def _chat_messages(dataset_context: str, user_request: str) -> list:
+    """Build the codegen message list, shared by the sync and async paths.
+
+    The system prompt and dataset context come first and are byte stable
+    across requests on the same DataFrame, so the server's prompt-prefix
+    cache can reuse them; only the final user message varies.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Dataset Context:\n{dataset_context}"},
+        {
+            "role": "user",
+            "content": f"User Request: {user_request}\n\n"
+                       "Please generate matplotlib code to create this visualization.",
+        },
+    ]
+
+
+# matplotlib.pyplot is imported lazily — it costs hundreds of ms and is
+# only needed once a visualization is actually executed
+_plt = None
+
+
+def _pyplot():
+    """Return matplotlib.pyplot, importing it on first use."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        # Headless runs (pytest, CI, piped output) get the Agg backend so
+        # importing pyplot never probes for a display
+        if os.environ.get("MPLBACKEND") is None and not sys.stdout.isatty():
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
+
+
+# Non-interactive backends render purely in memory and are safe to drive
+# from a worker thread; GUI toolkits (TkAgg, QtAgg, ...) require all
+# figure and canvas work to happen on the main thread
+_THREADSAFE_BACKENDS = frozenset({"agg", "pdf", "pgf", "ps", "svg", "template", "cairo"})
+
+
+def _backend_is_threadsafe() -> bool:
+    """Whether the active matplotlib backend can render off the main thread."""
+    _pyplot()  # ensure the backend has been selected
+    import matplotlib
+    return matplotlib.get_backend().lower() in _THREADSAFE_BACKENDS
+
+
+# Calls rejected outright when validating generated code
+_FORBIDDEN_CALLS = frozenset(
+    {"open", "eval", "exec", "__import__", "compile", "input", "breakpoint"}
+)
+
+
+def _validate_viz_ast(tree: ast.AST) -> None:
+    """Reject unsafe constructs in generated code with one AST walk.
+
+    A single O(nodes) pass up front replaces the old restricted
+    __builtins__ dict, which taxed every name lookup during plotting and
+    broke library internals that legitimately touch __import__. Snippets
+    may not import, call filesystem/exec primitives, or reach into
+    dunder attributes.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            raise ValueError(
+                "import statements are not allowed; pandas and matplotlib "
+                "are available as pd and plt"
+            )
+        if (isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id in _FORBIDDEN_CALLS):
+            raise ValueError(f"call to {node.func.id!r} is not allowed")
+        if isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            raise ValueError(f"access to {node.attr!r} is not allowed")
+
+
+# Markdown fence stripping as one precompiled match instead of a chain of
+# startswith/endswith slices
+_FENCE_RE = re.compile(r"\A```(?:python)?\s*\n?(.*?)\n?```\Z", re.DOTALL)
+
+
+def _strip_code_fences(code: str) -> str:
+    """Remove a surrounding markdown code fence, if present."""
+    match = _FENCE_RE.match(code)
+    return match.group(1) if match else code
+
+
+def _extract_code(raw: str) -> str:
+    """Pull the code string out of a model response.
+
+    The model is asked for {"code": "..."} JSON; fence stripping remains
+    as a fallback for responses that ignore the format.
+    """
+    try:
+        return json.loads(raw)["code"]
+    except (ValueError, KeyError, TypeError):
+        return _strip_code_fences(raw)
+
+
+# Compiled snippets keyed by content digest, so replays skip the parser
+# without the cache pinning every source string in memory
+_COMPILED_CODE_CACHE = {}
+_COMPILED_CODE_CACHE_MAX = 256
+
+
+def _compile_viz_code(code: str):
+    """Validate and compile a visualization snippet, reusing the result.
+
+    Interactive sessions frequently re-execute identical snippets; caching
+    covers both the AST safety walk and the compile, so replays skip the
+    parser entirely. optimize=2 strips asserts and docstrings from the
+    compiled snippet.
+    """
+    digest = hashlib.blake2b(code.encode(), digest_size=16).hexdigest()
+    code_obj = _COMPILED_CODE_CACHE.get(digest)
+    if code_obj is None:
+        tree = ast.parse(code)
+        _validate_viz_ast(tree)
+        code_obj = compile(tree, "<viz>", "exec", optimize=2)
+        if len(_COMPILED_CODE_CACHE) >= _COMPILED_CODE_CACHE_MAX:
+            # Evict the oldest entry (insertion order) to bound the cache
+            _COMPILED_CODE_CACHE.pop(next(iter(_COMPILED_CODE_CACHE)))
+        _COMPILED_CODE_CACHE[digest] = code_obj
+    return code_obj
+
+
+class _SemanticCache:
+    """Embedding-based cache for generated visualization code.
+
+    Exact prompt repeats hit a BLAKE2b-keyed lookup with no network
+    traffic; rephrased requests hit a cosine-similarity search over
+    normalized prompt embeddings held in an in-memory float32 matrix.
+    Entries persist in a small sqlite database so hits survive process
+    restarts.
+    """
+
+    SIMILARITY_THRESHOLD = 0.93
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db_path = db_path or _DEFAULT_CACHE_DB
+        os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self._db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(digest TEXT PRIMARY KEY, embedding BLOB, code TEXT)"
+        )
+        self._conn.commit()
+        self._embeddings = None  # (n, dim) float32, rows normalized
+        self._codes = []
+        # In-process exact-match layer in front of sqlite: repeat prompts in
+        # the same session resolve with a single dict lookup
+        self._exact = {}
+        self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT embedding, code FROM entries WHERE embedding IS NOT NULL"
+        ).fetchall()
+        if rows:
+            self._embeddings = np.vstack(
+                [np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+            self._codes = [code for _, code in rows]
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def lookup_exact(self, digest: str) -> Optional[str]:
+        code = self._exact.get(digest)
+        if code is not None:
+            return code
+        row = self._conn.execute(
+            "SELECT code FROM entries WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            self._exact[digest] = row[0]
+            return row[0]
+        return None
+
+    def lookup_similar(self, embedding: np.ndarray) -> Optional[str]:
+        if self._embeddings is None:
+            return None
+        scores = self._embeddings @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.SIMILARITY_THRESHOLD:
+            return self._codes[best]
+        return None
+
+    def store(self, digest: str, embedding: Optional[np.ndarray], code: str) -> None:
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (digest, embedding, code) VALUES (?, ?, ?)",
+            (digest, blob, code))
+        self._conn.commit()
+        self._exact[digest] = code
+        if embedding is not None:
+            row = embedding.astype(np.float32).reshape(1, -1)
+            self._embeddings = (row if self._embeddings is None
+                                else np.vstack([self._embeddings, row]))
+            self._codes.append(code)
+
+
+def _tpl_bar_by(plt, df, group, value):
+    grouped = df.groupby(group)[value].sum()
+    plt.figure(figsize=(10, 6))
+    plt.bar(grouped.index, grouped.values)
+    plt.title(f'Total {value.title()} by {group.title()}')
+    plt.xlabel(group.title())
+    plt.ylabel(f'Total {value.title()}')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.show()
+
+
+def _tpl_line_over_time(plt, df, time, value):
+    by_time = df.copy()
+    by_time[time] = pd.to_datetime(by_time[time])
+    series = by_time.groupby(time)[value].sum()
+    plt.figure(figsize=(12, 6))
+    plt.plot(series.index, series.values, marker='o')
+    plt.title(f'{value.title()} Over Time')
+    plt.xlabel(time.title())
+    plt.ylabel(f'Total {value.title()}')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.show()
+
+
+def _tpl_pie_by(plt, df, group, value):
+    grouped = df.groupby(group)[value].sum()
+    plt.figure(figsize=(8, 8))
+    plt.pie(grouped.values, labels=grouped.index, autopct='%1.1f%%')
+    plt.title(f'{value.title()} Distribution by {group.title()}')
+    plt.show()
+
+
+def _tpl_scatter(plt, df, x, y):
+    plt.figure(figsize=(10, 6))
+    plt.scatter(df[x], df[y], alpha=0.7)
+    plt.title(f'{x.title()} vs {y.title()}')
+    plt.xlabel(x.title())
+    plt.ylabel(y.title())
+    plt.tight_layout()
+    plt.show()
+
+
+def _tpl_hist(plt, df, x):
+    plt.figure(figsize=(10, 6))
+    plt.hist(df[x], bins=10, edgecolor='black', alpha=0.7)
+    plt.title(f'Distribution of {x.title()}')
+    plt.xlabel(x.title())
+    plt.ylabel('Frequency')
+    plt.tight_layout()
+    plt.show()
+
+
+# Recognizers for the canonical snippet shapes the LLM produces. Each
+# pattern is fullmatch'd line-by-line against the normalized snippet, so a
+# template is only substituted for code that is structurally identical to
+# it modulo column names and figsize — anything extra (nlargest, custom
+# aggregations, percent shares, ...) falls back to the exec path untouched.
+# The expected-labels callback double-checks that the title and axis labels
+# are exactly what the template itself will render, so the plot on screen
+# never diverges from the code shown to the user.
+_TEMPLATE_SHAPES = (
+    (re.compile(
+        r"df\['(?P<time>[^']+)'\] = pd\.to_datetime\(df\['(?P=time)'\]\)\n"
+        r"(?P<var>\w+) = df\.groupby\('(?P=time)'\)\['(?P<value>[^']+)'\]\.sum\(\)\.reset_index\(\)\n"
+        r"plt\.figure\(figsize=\([\d., ]+\)\)\n"
+        r"plt\.plot\((?P=var)\['(?P=time)'\],\s*(?P=var)\['(?P=value)'\],\s*marker='o'\)\n"
+        r"plt\.title\('(?P<title>[^']*)'\)\n"
+        r"plt\.xlabel\('(?P<xlabel>[^']*)'\)\n"
+        r"plt\.ylabel\('(?P<ylabel>[^']*)'\)\n"
+        r"plt\.xticks\(rotation=\d+\)\n"
+        r"plt\.tight_layout\(\)\n"
+        r"plt\.show\(\)"),
+     _tpl_line_over_time, ('time', 'value'),
+     lambda g: {'title': f"{g['value'].title()} Over Time",
+                'xlabel': g['time'].title(),
+                'ylabel': f"Total {g['value'].title()}"}),
+    (re.compile(
+        r"(?P<var>\w+) = df\.groupby\('(?P<group>[^']+)'\)\['(?P<value>[^']+)'\]\.sum\(\)\n"
+        r"plt\.figure\(figsize=\([\d., ]+\)\)\n"
+        r"plt\.bar\((?P=var)\.index,\s*(?P=var)\.values\)\n"
+        r"plt\.title\('(?P<title>[^']*)'\)\n"
+        r"plt\.xlabel\('(?P<xlabel>[^']*)'\)\n"
+        r"plt\.ylabel\('(?P<ylabel>[^']*)'\)\n"
+        r"plt\.xticks\(rotation=\d+\)\n"
+        r"plt\.tight_layout\(\)\n"
+        r"plt\.show\(\)"),
+     _tpl_bar_by, ('group', 'value'),
+     lambda g: {'title': f"Total {g['value'].title()} by {g['group'].title()}",
+                'xlabel': g['group'].title(),
+                'ylabel': f"Total {g['value'].title()}"}),
+    (re.compile(
+        r"(?P<var>\w+) = df\.groupby\('(?P<group>[^']+)'\)\['(?P<value>[^']+)'\]\.sum\(\)\n"
+        r"plt\.figure\(figsize=\([\d., ]+\)\)\n"
+        r"plt\.pie\((?P=var)\.values,\s*labels=(?P=var)\.index,\s*autopct='%1\.1f%%'\)\n"
+        r"plt\.title\('(?P<title>[^']*)'\)\n"
+        r"plt\.show\(\)"),
+     _tpl_pie_by, ('group', 'value'),
+     lambda g: {'title': f"{g['value'].title()} Distribution by {g['group'].title()}"}),
+    (re.compile(
+        r"plt\.figure\(figsize=\([\d., ]+\)\)\n"
+        r"plt\.scatter\(df\['(?P<x>[^']+)'\],\s*df\['(?P<y>[^']+)'\],\s*alpha=0\.7\)\n"
+        r"plt\.title\('(?P<title>[^']*)'\)\n"
+        r"plt\.xlabel\('(?P<xlabel>[^']*)'\)\n"
+        r"plt\.ylabel\('(?P<ylabel>[^']*)'\)\n"
+        r"plt\.tight_layout\(\)\n"
+        r"plt\.show\(\)"),
+     _tpl_scatter, ('x', 'y'),
+     lambda g: {'title': f"{g['x'].title()} vs {g['y'].title()}",
+                'xlabel': g['x'].title(),
+                'ylabel': g['y'].title()}),
+    (re.compile(
+        r"plt\.figure\(figsize=\([\d., ]+\)\)\n"
+        r"plt\.hist\(df\['(?P<x>[^']+)'\],\s*bins=10,\s*edgecolor='black',\s*alpha=0\.7\)\n"
+        r"plt\.title\('(?P<title>[^']*)'\)\n"
+        r"plt\.xlabel\('(?P<xlabel>[^']*)'\)\n"
+        r"plt\.ylabel\('Frequency'\)\n"
+        r"plt\.tight_layout\(\)\n"
+        r"plt\.show\(\)"),
+     _tpl_hist, ('x',),
+     lambda g: {'title': f"Distribution of {g['x'].title()}",
+                'xlabel': g['x'].title()}),
+)
+
+
+def _normalize_snippet(code: str) -> str:
+    """Strip blank and import lines and per-line whitespace so snippets
+    can be compared against the canonical shapes."""
+    lines = []
+    for line in code.strip().splitlines():
+        line = line.strip()
+        if not line or line.startswith('import ') or line.startswith('from '):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _match_template(code: str):
+    """Return (template_function, column_kwargs) for a recognized snippet."""
+    snippet = _normalize_snippet(code)
+    for pattern, template, columns, expected_labels in _TEMPLATE_SHAPES:
+        match = pattern.fullmatch(snippet)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        if all(groups.get(name) == text
+               for name, text in expected_labels(groups).items()):
+            return template, {name: groups[name] for name in columns}
+    return None
+
+
+class _PyplotProxy:
+    """Pyplot stand-in that reuses a single Figure across executions.
+
+    Generated snippets call plt.figure(...) and plt.show() on every run,
+    allocating a fresh Figure, canvas, and renderer each time — the
+    dominant cost for small plots. The proxy routes figure() to one shared
+    Figure (cleared before reuse) and turns show() into a non-blocking
+    redraw; every other attribute falls through to matplotlib.pyplot.
+    """
+
+    def __init__(self):
+        self._fig = None
+
+    def figure(self, *args, **kwargs):
+        plt = _pyplot()
+        if self._fig is None or not plt.fignum_exists(self._fig.number):
+            self._fig = plt.figure(*args, **kwargs)
+        else:
+            self._fig.clear()
+            plt.figure(self._fig.number)
+        return self._fig
+
+    def show(self, *args, **kwargs):
+        plt = _pyplot()
+        fig = self._fig if self._fig is not None else plt.gcf()
+        if _backend_is_threadsafe():
+            # Off-screen backend: a non-blocking redraw of the reused
+            # canvas is all there is to do
+            fig.canvas.draw_idle()
+        else:
+            # GUI backend: actually map the window and give the toolkit a
+            # moment to process events, without blocking like plt.show()
+            plt.show(block=False)
+            plt.pause(0.1)
+
+    def __getattr__(self, name):
+        return getattr(_pyplot(), name)
+
+
+class LLMInterface:
+    """Interface for generating visualization code using OpenAI LLMs."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._client = None
+        self._async_client = None
+        self._plt_proxy = _PyplotProxy()
+        self._response_cache = None
+        # Dataset-context embeddings keyed by content digest; the context
+        # rarely changes between viz requests in a session
+        self._ctx_embedding_cache = {}
+        # Reusable capture buffer for voice recordings; allocated on first
+        # use and regrown only if a longer recording is requested
+        self._audio_buf = None
+
+    def can_render_in_background(self) -> bool:
+        """Whether execute_visualization may run on a worker thread.
+
+        True only for non-interactive backends like Agg; GUI toolkits
+        must do their figure and canvas work on the main thread.
+        """
+        return _backend_is_threadsafe()
+
+    @property
+    def client(self):
+        """Lazily constructed OpenAI client.
+
+        Importing openai pulls in httpx/pydantic (hundreds of ms), so defer
+        it until a request is actually made — demo and info-only paths never
+        pay the cost.
+        """
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self._api_key,
+                                  http_client=_shared_http_client())
+        return self._client
+
+    @property
+    def async_client(self):
+        """Lazily constructed async OpenAI client."""
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self._api_key,
+                                             http_client=_shared_async_http_client())
+        return self._async_client
+
+    @property
+    def response_cache(self) -> _SemanticCache:
+        """Lazily constructed semantic response cache."""
+        if self._response_cache is None:
+            self._response_cache = _SemanticCache()
+        return self._response_cache
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Get a normalized embedding for cache similarity lookups."""
+        response = self.client.embeddings.create(
+            model="text-embedding-3-small", input=text
+        )
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _embed_context_request(self, dataset_context: str, user_request: str) -> np.ndarray:
+        """Build the cache-query embedding for a (context, request) pair.
+
+        The dataset context dominates the token count but rarely changes
+        within a session, so its embedding is cached by content digest and
+        only the short user request is embedded per call. The two vectors
+        are summed and renormalized for similarity lookup.
+        """
+        ctx_digest = _SemanticCache.digest(dataset_context)
+        ctx_embedding = self._ctx_embedding_cache.get(ctx_digest)
+        if ctx_embedding is None:
+            ctx_embedding = self._embed(dataset_context)
+            self._ctx_embedding_cache[ctx_digest] = ctx_embedding
+        request_embedding = self._embed(user_request)
+        combined = ctx_embedding + request_embedding
+        norm = np.linalg.norm(combined)
+        return combined / norm if norm else combined
+
+    def generate_visualization_code(
+        self, dataset_context: str, user_request: str, n: int = 1,
+        temperature: float = _CHAT_TEMPERATURE
+    ):
+        """Generate matplotlib code for the requested visualization.
+
+        With n > 1, all candidate variants come back from a single request
+        (one network round trip, one prompt-token charge) and a list of
+        code strings is returned instead of a single string.
+        """
+
+        # Exact repeats skip the network entirely; rephrased requests are
+        # served by cosine similarity over prompt embeddings. Multi-variant
+        # and high-temperature requests bypass the cache — the caller
+        # explicitly wants fresh samples.
+        digest = None
+        embedding = None
+        if n == 1 and temperature <= _CACHE_MAX_TEMPERATURE:
+            cache_key = f"{dataset_context}\n---\n{user_request}"
+            digest = _SemanticCache.digest(cache_key)
+            cached_code = self.response_cache.lookup_exact(digest)
+            if cached_code is not None:
+                return cached_code
+
+            try:
+                embedding = self._embed_context_request(dataset_context, user_request)
+                similar_code = self.response_cache.lookup_similar(embedding)
+                if similar_code is not None:
+                    return similar_code
+            except Exception:
+                # Embeddings unavailable (offline, quota, ...); fall through
+                # to the chat completion with exact-match caching only
+                pass
 
         try:
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                max_tokens=1000,
-                temperature=0.1,
+                model=_CHAT_MODEL,
+                messages=_chat_messages(dataset_context, user_request),
+                max_tokens=_CHAT_MAX_TOKENS,
+                temperature=temperature,
+                n=n,
+                response_format={"type": "json_object"},
+                stream=True,
+            )
+
+            # Assemble the streamed deltas per choice as they arrive
+            # instead of blocking on the fully generated response
+            buffers = {}
+            for chunk in response:
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        buffers.setdefault(choice.index, []).append(choice.delta.content)
+
+            codes = [
+                _extract_code("".join(buffers.get(i, [])).strip()).strip()
+                for i in range(n)
+            ]
+            if n > 1:
+                return codes
+
+            code = codes[0]
+            if digest is not None:
+                self.response_cache.store(digest, embedding, code)
+            return code
+
+        except Exception as e:
+            raise Exception(f"Failed to generate visualization code: {str(e)}")
+
+    async def _embed_async(self, text: str) -> np.ndarray:
+        """Async counterpart of _embed."""
+        response = await self.async_client.embeddings.create(
+            model="text-embedding-3-small", input=text
+        )
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def _embed_context_request_async(
+        self, dataset_context: str, user_request: str
+    ) -> np.ndarray:
+        """Async counterpart of _embed_context_request; shares its
+        per-context embedding cache with the sync path."""
+        ctx_digest = _SemanticCache.digest(dataset_context)
+        ctx_embedding = self._ctx_embedding_cache.get(ctx_digest)
+        if ctx_embedding is None:
+            ctx_embedding = await self._embed_async(dataset_context)
+            self._ctx_embedding_cache[ctx_digest] = ctx_embedding
+        request_embedding = await self._embed_async(user_request)
+        combined = ctx_embedding + request_embedding
+        norm = np.linalg.norm(combined)
+        return combined / norm if norm else combined
+
+    async def generate_visualization_code_async(
+        self, dataset_context: str, user_request: str,
+        temperature: float = _CHAT_TEMPERATURE
+    ) -> str:
+        """Async variant of generate_visualization_code.
+
+        Several independent requests can be issued concurrently with
+        asyncio.gather, completing in roughly one round-trip latency
+        instead of one per request:
+
+            codes = await asyncio.gather(*[
+                llm.generate_visualization_code_async(ctx, req)
+                for req in requests
+            ])
+
+        Caching behaves exactly as in the sync path — both share the
+        semantic response cache and the per-context embedding cache.
+        """
+        digest = None
+        embedding = None
+        if temperature <= _CACHE_MAX_TEMPERATURE:
+            cache_key = f"{dataset_context}\n---\n{user_request}"
+            digest = _SemanticCache.digest(cache_key)
+            cached_code = self.response_cache.lookup_exact(digest)
+            if cached_code is not None:
+                return cached_code
+
+            try:
+                embedding = await self._embed_context_request_async(dataset_context, user_request)
+                similar_code = self.response_cache.lookup_similar(embedding)
+                if similar_code is not None:
+                    return similar_code
+            except Exception:
+                pass
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=_CHAT_MODEL,
+                messages=_chat_messages(dataset_context, user_request),
+                max_tokens=_CHAT_MAX_TOKENS,
+                temperature=temperature,
+                response_format={"type": "json_object"},
+                stream=True,
             )
 
-            code = response.choices[0].message.content.strip()
-            # Clean up the code to remove markdown formatting if present
-            if code.startswith("```python"):
-                code = code[9:-3] if code.endswith("```") else code[9:]
-            elif code.startswith("```"):
-                code = code[3:-3] if code.endswith("```") else code[3:]
+            parts = []
+            async for chunk in response:
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        parts.append(choice.delta.content)
 
-            return code.strip()
+            code = _extract_code("".join(parts).strip()).strip()
+            if digest is not None:
+                self.response_cache.store(digest, embedding, code)
+            return code
 
         except Exception as e:
             raise Exception(f"Failed to generate visualization code: {str(e)}")
 
+    def generate_visualization_codes(
+        self, dataset_context: str, user_requests: list
+    ) -> list:
+        """Generate code for several requests concurrently.
+
+        Sync wrapper over the async path for callers without an event
+        loop; the underlying requests run in parallel via asyncio.gather.
+        """
+        async def _gather():
+            global _ASYNC_HTTP_CLIENT
+            try:
+                return await asyncio.gather(*[
+                    self.generate_visualization_code_async(dataset_context, request)
+                    for request in user_requests
+                ])
+            finally:
+                # The pooled async clients are bound to this event loop,
+                # which asyncio.run closes on exit — close them here, while
+                # the loop is still running, and drop the references so the
+                # next call rebuilds them. Connection reuse within one
+                # gather is unaffected.
+                if self._async_client is not None:
+                    await self._async_client.close()
+                    self._async_client = None
+                if _ASYNC_HTTP_CLIENT is not None:
+                    await _ASYNC_HTTP_CLIENT.aclose()
+                    _ASYNC_HTTP_CLIENT = None
+
+        return asyncio.run(_gather())
+
+    def record_and_transcribe_voice(
+        self, duration: int = 5, sample_rate: int = 16000
+    ) -> str:
+        """Record microphone audio and transcribe it with Whisper.
+
+        Audio is captured at 16 kHz mono by default — Whisper resamples
+        everything to 16 kHz internally, so recording above that only
+        inflates the upload (44.1 kHz is 2.76x the bytes for identical
+        transcription quality).
+
+        The sounddevice callback writes int16 frames straight into a
+        preallocated buffer that is reused across recordings, so capture
+        allocates nothing on the hot path. Leading and trailing silence is
+        trimmed with a cheap energy-based VAD before upload — Whisper
+        inference time scales roughly linearly with audio length, so the
+        pauses around the spoken request would otherwise be paid for
+        twice, in bandwidth and in inference. Requires the optional
+        'sounddevice' package.
+        """
+        try:
+            import sounddevice as sd
+        except ImportError as e:
+            raise Exception(
+                "Voice input requires the optional 'sounddevice' package. "
+                "Install it with: pip install sounddevice"
+            ) from e
+
+        needed = int(duration * sample_rate)
+        if self._audio_buf is None or self._audio_buf.shape[0] < needed:
+            self._audio_buf = np.empty(needed, dtype=np.int16)
+        capture = self._audio_buf
+        written = 0
+
+        def _on_audio(indata, frame_count, time_info, status):
+            nonlocal written
+            chunk = np.frombuffer(indata, dtype=np.int16)
+            end = min(written + chunk.shape[0], needed)
+            capture[written:end] = chunk[:end - written]
+            written = end
+
+        # Prefer a FLAC container when soundfile/libsndfile is available:
+        # lossless for ASR but ~2-3x fewer upload bytes than raw WAV for
+        # speech. Fall back to a stdlib WAV container otherwise.
+        try:
+            import soundfile as sf
+        except ImportError:
+            sf = None
+
+        # The recording never needs to touch disk: pack the audio into an
+        # in-memory buffer and upload straight from it
+        buf = io.BytesIO()
+        try:
+            # Warm the HTTPS connection to the API while the recording
+            # runs, so the TLS handshake is off the critical path by the
+            # time the audio is ready to upload. The shared keepalive pool
+            # keeps the socket open for the transcription request.
+            def _warm_connection():
+                try:
+                    self.client.models.list()
+                except Exception:
+                    pass  # best-effort; the upload will connect normally
+
+            threading.Thread(target=_warm_connection, daemon=True).start()
+
+            with sd.RawInputStream(samplerate=sample_rate, channels=1,
+                                   dtype='int16', callback=_on_audio):
+                sd.sleep(int(duration * 1000))
+
+            pcm = _audio.trim_silence(capture[:written], sample_rate)
+            if sf is not None:
+                # DC removal + peak normalization before encoding; helps
+                # Whisper on quiet or offset recordings
+                pcm = _audio.preprocess_audio(pcm)
+                sf.write(buf, pcm, sample_rate, format="FLAC")
+                buf.name = "audio.flac"  # the SDK derives the upload filename from this
+            else:
+                wav = wave.open(buf, "wb")
+                wav.setnchannels(1)
+                wav.setsampwidth(2)  # int16
+                wav.setframerate(sample_rate)
+                wav.writeframes(pcm.tobytes())
+                wav.close()
+                buf.name = "audio.wav"
+
+            buf.seek(0)
+            transcript = self.client.audio.transcriptions.create(
+                model="whisper-1", file=buf, response_format="text"
+            )
+        except Exception as e:
+            raise Exception(f"Failed to record and transcribe voice: {str(e)}")
+
+        return str(transcript).strip()
+
     def execute_visualization(self, code: str, df: pd.DataFrame) -> None:
         """Execute the generated visualization code safely."""
-        # Create a safe execution environment
+        # Structurally known snippets run through a prebuilt template
+        # function — no compile, no exec
+        template = _match_template(code)
+        if template is not None:
+            template_func, columns = template
+            try:
+                template_func(self._plt_proxy, df, **columns)
+            except Exception as e:
+                raise Exception(f"Failed to execute visualization code: {str(e)}")
+            return
+
+        # Safety comes from the AST validation in _compile_viz_code, so the
+        # snippet runs with normal builtins — plotting internals no longer
+        # pay restricted-dict lookups (or break on indirect __import__ use)
         exec_globals = {
             "df": df,
-            "plt": plt,
+            "plt": self._plt_proxy,
             "pd": pd,
-            "__builtins__": {},  # Restrict built-in functions for safety
         }
 
-        # Add safe built-ins back
-        safe_builtins = [
-            "len",
-            "str",
-            "int",
-            "float",
-            "list",
-            "dict",
-            "range",
-            "enumerate",
-            "zip",
-            "max",
-            "min",
-            "sum",
-        ]
-        for builtin in safe_builtins:
-            exec_globals["__builtins__"][builtin] = eval(builtin)
-
         try:
-            exec(code, exec_globals)
+            exec(_compile_viz_code(code), exec_globals)
         except Exception as e:
             raise Exception(f"Failed to execute visualization code: {str(e)}")
@@ -0,0 +1,35 @@
+"""
+Tests for the audio preprocessing helpers.
+"""
+
+import numpy as np
+from _audio import preprocess_audio, trim_silence
+
+
+class TestAudioHelpers:
+    """Test cases for voice-capture audio helpers."""
+
+    def test_trim_silence(self):
+        """Test that leading and trailing silence is removed."""
+        sample_rate = 16000
+        silence = np.zeros(sample_rate, dtype=np.int16)
+        speech = np.full(sample_rate, 5000, dtype=np.int16)
+        pcm = np.concatenate([silence, speech, silence])
+
+        trimmed = trim_silence(pcm, sample_rate)
+
+        # Roughly the speech second, with at most a frame of padding each side
+        assert len(speech) <= len(trimmed) <= len(speech) + 2 * (sample_rate // 40)
+
+    def test_trim_silence_all_silent(self):
+        """Test that an all-silent buffer passes through unchanged."""
+        pcm = np.zeros(16000, dtype=np.int16)
+        assert trim_silence(pcm, 16000) is pcm
+
+    def test_preprocess_audio_normalizes_peak(self):
+        """Test DC removal and peak normalization."""
+        pcm = np.array([100, 1100, 100, -900], dtype=np.int16)
+        out = preprocess_audio(pcm)
+
+        assert out.dtype == np.int16
+        assert np.abs(out.astype(np.int64)).max() == 32000
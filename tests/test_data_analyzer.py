@@ -44,6 +44,22 @@ class TestDataAnalyzer:
         assert cat_stats['department']['most_frequent'] == 'HR'
         assert cat_stats['department']['most_frequent_count'] == 2
     
+    def test_get_top_values(self, sample_dataframe):
+        """Test on-demand top-k value counts for a categorical column."""
+        analyzer = DataAnalyzer(sample_dataframe)
+        top_values = analyzer.get_top_values('department', k=2)
+
+        assert top_values['HR'] == 2
+        assert len(top_values) == 2
+
+    def test_metadata_is_cached(self, sample_dataframe):
+        """Test that repeated metadata calls reuse the cached results."""
+        analyzer = DataAnalyzer(sample_dataframe)
+
+        # Same dict/string objects should be returned on repeat calls
+        assert analyzer.get_metadata() is analyzer.get_metadata()
+        assert analyzer.format_for_llm() is analyzer.format_for_llm()
+
     def test_format_for_llm(self, sample_dataframe):
         """Test LLM formatting functionality."""
         analyzer = DataAnalyzer(sample_dataframe)
@@ -79,4 +95,20 @@ class TestDataAnalyzer:
         assert 'salary' in num_stats
         assert num_stats['salary']['mean'] == 58750.0
         assert num_stats['salary']['min'] == 50000.0
-        assert num_stats['salary']['max'] == 70000.0
\ No newline at end of file
+        assert num_stats['salary']['max'] == 70000.0
+
+    def test_format_compact_schema(self, sample_dataframe):
+        """Test compact JSON schema formatting."""
+        import json
+
+        analyzer = DataAnalyzer(sample_dataframe)
+        schema = json.loads(analyzer.format_compact_schema())
+
+        assert schema['shape'] == [4, 4]
+        columns = {entry['name']: entry for entry in schema['columns']}
+        assert columns['age']['stats']['min'] == 25.0
+        assert columns['age']['stats']['max'] == 35.0
+        assert columns['department']['stats']['top'] == 'HR'
+
+        # Byte-stable across calls so the prompt-prefix cache can hit
+        assert analyzer.format_compact_schema() is analyzer.format_compact_schema()
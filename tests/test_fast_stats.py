@@ -0,0 +1,26 @@
+"""
+Tests for the fused column-statistics kernel.
+"""
+
+import numpy as np
+import pandas as pd
+from _fast_stats import col_minmax_meanstd
+
+
+class TestFastStats:
+    """Test cases for the fused min/max/mean/std reductions."""
+
+    def test_parity_with_pandas_agg(self):
+        """Test that the fused sweep matches the pandas agg path."""
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(1000, 3))
+        values[::7, 0] = np.nan  # NaNs must be skipped, not propagated
+
+        mins, maxs, means, stds = col_minmax_meanstd(values)
+
+        df = pd.DataFrame(values)
+        agg = df.agg(['min', 'max', 'mean', 'std'])
+        np.testing.assert_allclose(mins, agg.loc['min'].to_numpy())
+        np.testing.assert_allclose(maxs, agg.loc['max'].to_numpy())
+        np.testing.assert_allclose(means, agg.loc['mean'].to_numpy())
+        np.testing.assert_allclose(stds, agg.loc['std'].to_numpy())
@@ -4,7 +4,7 @@ Tests for the LLMInterface component.
 
 import pytest
 import pandas as pd
-from llm_interface import LLMInterface
+from llm_interface import LLMInterface, _strip_code_fences
 
 
 class TestLLMInterface:
@@ -20,6 +20,12 @@ class TestLLMInterface:
         interface = LLMInterface()
         assert interface.client is not None
     
+    def test_strip_code_fences(self):
+        """Test markdown fence removal from generated code."""
+        assert _strip_code_fences("```python\nplt.show()\n```") == "plt.show()"
+        assert _strip_code_fences("```\nplt.show()\n```") == "plt.show()"
+        assert _strip_code_fences("plt.show()") == "plt.show()"
+
     def test_execute_visualization_basic(self, sample_dataframe, mock_openai_key):
         """Test basic visualization code execution."""
         interface = LLMInterface()
@@ -66,7 +72,16 @@ plt.close()
         
         # Code that tries to use restricted operations
         code = "open('/etc/passwd', 'r')"  # Should be blocked
-        
+
+        with pytest.raises(Exception, match="Failed to execute visualization code"):
+            interface.execute_visualization(code, sample_dataframe)
+
+    def test_execute_visualization_rejects_imports(self, sample_dataframe, mock_openai_key):
+        """Test that import statements are rejected before execution."""
+        interface = LLMInterface()
+
+        code = "import os\nos.listdir('/')"
+
         with pytest.raises(Exception, match="Failed to execute visualization code"):
             interface.execute_visualization(code, sample_dataframe)
     